@@ -0,0 +1,166 @@
+## ---------------------------------------------------------------------------
+## FILE: decoders\mfm_flux\pd.py
+## PURPOSE: Recover halfbit cells from floppy and hard disk pulse stream.
+##
+## Copyright (C) 2025 Rasz_pl <https://github.com/raszpl>
+## ---------------------------------------------------------------------------
+## This file is part of the libsigrokdecode project.
+##
+## This program is free software: you can redistribute it and/or modify
+## it under the terms of the GNU General Public License as published by
+## the Free Software Foundation, either version 3 of the License, or
+## (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with this program.  If not, see <https://www.gnu.org/licenses/>.
+##
+
+import sigrokdecode as srd
+from types import SimpleNamespace
+
+# ----------------------------------------------------------------------------
+# PURPOSE: Signal recoverable errors to DSView GUI and sigrok-cli output.
+# ----------------------------------------------------------------------------
+
+class raise_exception(Exception):
+	pass
+
+# ----------------------------------------------------------------------------
+# PURPOSE: Free running PLL, bottom of mfm_flux + mfm_format stack.
+# NOTES:
+#  - PI Loop Filter like mfm SimplePLL, but without any knowledge of
+#	 encoding or Sync Marks. It never gets reset by failed Sync Mark search
+#	 so integrator is a plain frequency offset from nominal halfbit instead
+#	 of being accumulated into halfbit every edge, and phase error is not
+#	 divided by nominal halfbit. Same pll_ki value is a different gain than
+#	 in mfm decoder.
+#  - Pulses outside of 1..max_cells halfbit cells (dropouts, glitches,
+#	 suppress) re-anchor PLL at nominal halfbit.
+#  - Python Output, first ['CONFIG', (samplerate, data_rate)] then for every
+#	 leading edge ['EDGE', (halfbit_cells, halfbit, phase_err, index_pin)]
+#	 spanning previous edge to this one. halfbit is estimate used to count
+#	 halfbit_cells, before this edge updated it.
+# ----------------------------------------------------------------------------
+
+class Decoder(srd.Decoder):
+	api_version = 3
+	id = 'mfm_flux'
+	name = 'MFM flux'
+	longname = 'FM/MFM/RLL flux PLL'
+	desc = 'Recover halfbit cells from floppy and hard disk FM, MFM or RLL pulse stream.'
+	license = 'gplv3+'
+	inputs = ['logic']
+	outputs = ['mfm_flux']
+	tags = ['Disk', 'PC', 'Retro computing']
+	channels = (
+		{'id': 'data', 'name': 'Read data', 'desc': 'channel 0', 'idn':'dec_mfm_flux_chan_data'},
+	)
+	optional_channels = (
+		{'id': 'index', 'name': 'Index pulses', 'desc': 'channel 1', 'idn':'dec_mfm_flux_chan_index'},
+		{'id': 'suppress', 'name': 'Suppress pulses', 'desc': 'channel 2', 'idn':'dec_mfm_flux_chan_suppress'},
+	)
+	annotations = (
+		('cel', 'halfbit cells'),
+		('rst', 'PLL re-anchor'),
+	)
+
+	global ann
+	ann = SimpleNamespace(**{key: idx for idx, (key, _) in enumerate(annotations)})
+
+	annotation_rows = (
+		('cells', 'Cells', (ann.cel,)),
+		('resets', 'Resets', (ann.rst,)),
+	)
+	options = (
+		{'id': 'leading_edge', 'desc': 'Leading edge',
+			'default': 'rising', 'values': ('rising', 'falling')},
+		{'id': 'data_rate', 'desc': 'Data rate (bps)',
+			'default': '5000000', 'values': ('125000', '150000',
+			'250000', '300000', '500000', '5000000', '7500000', '10000000')},
+		{'id': 'pll_kp', 'desc': 'PLL: PI Filter Kp (proportinal)',
+			'default': '0.5'},
+		{'id': 'pll_ki', 'desc': 'PLL: PI Filter Ki (integral), samples of halfbit offset per sample of phase error, not normalized like mfm pll_ki',
+			'default': '0.0005'},
+		{'id': 'max_cells', 'desc': 'Longest Pulse (halfbit cells) PLL tracks, longer ones re-anchor it',
+			'default': '16'},
+		{'id': 'annotate', 'desc': 'Annotate halfbit cells of every Pulse',
+			'default': 'no', 'values': ('yes', 'no')},
+	)
+
+	def __init__(self):
+		self.reset()
+
+	def reset(self):
+		self.samplerate = None
+		self.resets = 0				# number of PLL re-anchors
+
+	def start(self):
+		self.out_ann = self.register(srd.OUTPUT_ANN)
+		self.out_python = self.register(srd.OUTPUT_PYTHON)
+		self.rising_edge = True if self.options['leading_edge'] == 'rising' else False
+		self.data_rate = float(self.options['data_rate'])
+		self.pll_kp = float(self.options['pll_kp'])
+		self.pll_ki = float(self.options['pll_ki'])
+		self.max_cells = max(int(self.options['max_cells']), 1)
+		self.annotate = True if self.options['annotate'] == 'yes' else False
+
+	def metadata(self, key, value):
+		if key == srd.SRD_CONF_SAMPLERATE:
+			self.samplerate = value
+
+	def decode(self):
+		if not self.samplerate:
+			raise raise_exception('Cannot decode without samplerate.')
+
+		halfbit_nom = self.samplerate / self.data_rate / 2.0
+		halfbit_nom05 = 0.5 * halfbit_nom
+		halfbit_nom15 = 1.5 * halfbit_nom
+		halfbit = halfbit_nom
+		integrator = 0.0
+		kp = self.pll_kp
+		ki = self.pll_ki
+		max_cells = self.max_cells
+		annotate = self.annotate
+		out_python = self.out_python
+		put = self.put
+		wait = self.wait
+		# Wait for leading edge (rising or falling) on channel 0 and disable/suppress signal on channel 2.
+		conditions = [{0: 'r' if self.rising_edge else 'f', 2: 'l'}]
+
+		last_samplenum = 0
+		phase_ref = 0.0
+		put(0, 0, out_python, ['CONFIG', (self.samplerate, self.data_rate)])
+
+		while True:
+			(data_pin, index_pin, suppress_pin) = wait(conditions)
+			edge_samplenum = self.samplenum
+			halfbit_used = halfbit
+			halfbit_cells = round((edge_samplenum - last_samplenum) / halfbit)
+
+			if 0 < halfbit_cells <= max_cells:
+				phase_ref += halfbit_cells * halfbit
+				phase_err = edge_samplenum - phase_ref
+				phase_ref += kp * phase_err
+				integrator += ki * phase_err
+				halfbit = halfbit_nom + integrator
+				if halfbit < halfbit_nom05:
+					halfbit = halfbit_nom05
+				elif halfbit > halfbit_nom15:
+					halfbit = halfbit_nom15
+			else:
+				phase_err = 0.0
+				phase_ref = edge_samplenum
+				halfbit = halfbit_nom
+				integrator = 0.0
+				self.resets += 1
+				put(last_samplenum, edge_samplenum, self.out_ann, [ann.rst, ['PLL re-anchor %d cells' % halfbit_cells, 'Re-anchor', 'R']])
+
+			put(last_samplenum, edge_samplenum, out_python, ['EDGE', (halfbit_cells, halfbit_used, phase_err, index_pin)])
+			if annotate:
+				put(last_samplenum, edge_samplenum, self.out_ann, [ann.cel, [str(halfbit_cells)]])
+			last_samplenum = edge_samplenum
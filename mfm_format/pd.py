@@ -0,0 +1,103 @@
+## ---------------------------------------------------------------------------
+## FILE: decoders\mfm_format\pd.py
+## PURPOSE: Decode FM, MFM and RLL records from mfm_flux halfbit cells.
+##
+## Copyright (C) 2025 Rasz_pl <https://github.com/raszpl>
+## ---------------------------------------------------------------------------
+## This file is part of the libsigrokdecode project.
+##
+## This program is free software: you can redistribute it and/or modify
+## it under the terms of the GNU General Public License as published by
+## the Free Software Foundation, either version 3 of the License, or
+## (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with this program.  If not, see <https://www.gnu.org/licenses/>.
+##
+
+import sigrokdecode as srd
+from mfm.pd import Decoder as MFMDecoder
+
+# mfm decoder options owned by mfm_flux or legacy decoder, or finishing only at
+# end of input which stacked decoders never see
+options_flux = ('leading_edge', 'data_rate', 'decoder', 'pll_kp', 'pll_ki', 'dsply_pfx',
+	'track_output', 'drive_cylinders', 'drive_heads', 'drive_sectors', 'drive_first_sector',
+	'profile', 'profile_file', 'trace', 'trace_file', 'telemetry', 'telemetry_file')
+
+# ----------------------------------------------------------------------------
+# PURPOSE: mfm decoder stacked on top of mfm_flux.
+# NOTES:
+#  - Everything past PLL (Sync Mark scanning, byte decoding, CRC/ECC, all
+#	 annotations and Binary/Python Outputs) is mfm decoder code, only source
+#	 of edges and halfbit estimate changes. Several instances with different
+#	 format/header_format can share one mfm_flux PLL.
+#  - Options owned by mfm_flux (leading_edge, data_rate, pll_kp, pll_ki) and
+#	 legacy decoder ones are removed.
+#  - Stacked decoders dont see end of input. Everything finalized there is
+#	 removed and pinned off: tr/emu/ex Binary Outputs (track_output,
+#	 drive_*), profile report and cProfile/tracemalloc files, trace dump and
+#	 last telemetry chunk. What stays loses its tail: last pulse_runs run is
+#	 never annotated and Meta Output misses span after last meta_interval.
+# ----------------------------------------------------------------------------
+
+class Decoder(MFMDecoder):
+	id = 'mfm_format'
+	name = 'MFM format'
+	longname = 'FM/MFM/RLL format decoding'
+	desc = 'Decode floppy and hard disk FM, MFM or RLL records from mfm_flux halfbit cells.'
+	inputs = ['mfm_flux']
+	outputs = ['mfm']
+	channels = ()
+	optional_channels = ()
+
+	options = tuple(item for item in MFMDecoder.options if item['id'] not in options_flux)
+	options_valid = {item['id']: item['values'] for item in options if 'values' in item}
+
+	# ------------------------------------------------------------------------
+	# PURPOSE: SimplePLL following mfm_flux instead of its own PI Loop Filter.
+	# NOTES: halfbit is the one mfm_flux counted halfbit_cells with, so both
+	#  agree on every Pulse. Locking and Sync Mark logic stay local.
+	# ------------------------------------------------------------------------
+
+	class FluxPLL(MFMDecoder.SimplePLL):
+		__slots__ = ()
+
+		def track(self, edge_samplenum):
+			return self.owner.flux_phase_err
+
+		def edge(self, edge_samplenum):
+			self.halfbit = self.owner.flux_halfbit
+			return super().edge(edge_samplenum)
+
+	SimplePLL = FluxPLL
+
+	def start(self):
+		# Options removed above still feed mfm start(), pin them to mfm defaults
+		# (all end of input outputs off).
+		options = dict(self.options)
+		for item in MFMDecoder.options:
+			options.setdefault(item['id'], item['default'])
+		options['decoder'] = 'PLL'
+		self.options = options
+		super().start()
+		self.edges = None
+
+	def decode(self, ss, es, data):
+		cmd, values = data
+		if cmd == 'EDGE':
+			if self.edges:
+				self.samplenum = es
+				# halfbit_cells not needed, SimplePLL.edge() rounds same Pulse by same
+				# flux_halfbit and gets identical count
+				(_, self.flux_halfbit, self.flux_phase_err, index_pin) = values
+				self.edges.send(index_pin)
+		elif cmd == 'CONFIG':
+			(samplerate, self.data_rate) = values
+			self.metadata(srd.SRD_CONF_SAMPLERATE, samplerate)
+			self.edges = self.decode_PLL_edges()
+			next(self.edges)
@@ -0,0 +1,80 @@
+# Batch CRC verification of idcrc/datacrc Binary Output dumps.
+# Every record in a dump has same length, so whole file is one 2-D byte array
+# and CRC advances one byte column at a time for all records at once.
+import sys
+import argparse
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+def make_crc_table(crc_poly, crc_bits):
+	mask = (1 << crc_bits) - 1
+	topbit = 1 << (crc_bits - 1)
+	shift = crc_bits - 8
+	crc_table = np.zeros(256, dtype=np.uint64)
+	for i in range(256):
+		crc = i << shift
+		for _ in range(8):
+			if crc & topbit:
+				crc = ((crc << 1) ^ crc_poly) & mask
+			else:
+				crc = (crc << 1) & mask
+		crc_table[i] = crc
+	return crc_table
+
+# ------------------------------------------------------------------------
+# PURPOSE: Verify CRC of many equal length records at once.
+# IN: records	2-D uint8 array, one record (marks + payload + crc) per row
+#  crc_poly, crc_bits, crc_init	same meaning as decoder options
+# OUT: boolean vector, True where record CRC residue is zero (CRC OK)
+# NOTES: Non reflected MSB first CRC, same as decoder. Loop runs over
+#  record length, every step is a vectorized table lookup over all rows.
+# ------------------------------------------------------------------------
+
+def batch_crc_verify(records, crc_poly, crc_bits, crc_init):
+	if crc_bits < 8 or crc_bits > 64:
+		raise ValueError(f"CRC size {crc_bits} not supported")
+	mask = np.uint64((1 << crc_bits) - 1)
+	shift = np.uint64(crc_bits - 8)
+	eight = np.uint64(8)
+	crc_table = make_crc_table(crc_poly, crc_bits)
+
+	records = np.asarray(records, dtype=np.uint8)
+	crc = np.full(records.shape[0], crc_init & int(mask), dtype=np.uint64)
+	for column in records.T:
+		index = (crc >> shift) ^ column
+		crc = ((crc << eight) & mask) ^ crc_table[index]
+	return crc == 0
+
+def load_records(filename, record_size):
+	data = np.fromfile(filename, dtype=np.uint8)
+	if not record_size or len(data) % record_size:
+		raise ValueError(f"{filename} size {len(data)} is not a multiple of record size {record_size}")
+	return data.reshape(-1, record_size)
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description='Batch CRC verification of mfm decoder idcrc/datacrc Binary Output dumps')
+	parser.add_argument('-s', '--size', type=int, required=True, help='Record size in bytes: marks + payload + crc, eg 520 for A1 F8 + 512 + 6 byte ECC')
+	parser.add_argument('-w', '--width', type=int, default=32, help='CRC size in bits (default 32)')
+	parser.add_argument('-p', '--poly', type=lambda x: int(x, 0), default=0xA00805, help='CRC Polynomial (default 0xA00805)')
+	parser.add_argument('-i', '--init', type=lambda x: int(x, 0), default=0xffffffffffffff, help='CRC init, masked to CRC size (default 0xffffffffffffff)')
+	parser.add_argument('-l', '--list', action='store_true', help='List indexes of records failing CRC')
+	parser.add_argument('filename', help='idcrc or datacrc dump')
+	args = parser.parse_args()
+
+	if np is None:
+		parser.error("numpy is required")
+	try:
+		records = load_records(args.filename, args.size)
+		crc_ok = batch_crc_verify(records, args.poly, args.width, args.init)
+	except ValueError as e:
+		parser.error(e)
+
+	bad = np.flatnonzero(~crc_ok)
+	if args.list:
+		for index in bad:
+			print(index)
+	print(f"Records: {len(crc_ok)} CRC_OK: {len(crc_ok) - len(bad)} CRC_err: {len(bad)}", file=sys.stderr if args.list else sys.stdout)
+	sys.exit(1 if len(bad) else 0)